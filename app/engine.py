@@ -1,55 +1,150 @@
-from datetime import datetime, timedelta
+from dataclasses import replace
+import multiprocessing
+import os
 import random
 
+import numpy as np
 
-def calculate_cash_flow(transactions):
-    total_income = 0
-    total_expense = 0
+from app.models import EXPENSE, INCOME
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional, only needed for backend="numba"
+    njit = None
+    prange = range
+
+try:
+    from app.engine_fast import simulate_many
+except ImportError:  # compiled kernel is optional, only needed for backend="cython" (see build_ext.py)
+    simulate_many = None
+
+# [income, expense, other] amount multipliers, indexed by transaction type
+SCENARIO_MULTIPLIERS = {
+    "base": np.array([1.0, 1.0, 1.0]),
+    "optimistic": np.array([1.15, 0.95, 1.0]),  # +15% income, -5% expenses
+    "conservative": np.array([0.85, 1.10, 1.0]),  # -15% income, +10% expenses
+}
+
+# Below this many runs, process startup costs more than it saves
+PARALLEL_MIN_SIMULATIONS = 50
+
+# backend="numpy" draws runs in blocks of this many, each from its own
+# stream, so results don't depend on how runs are sharded across processes
+SIMULATION_BLOCK_SIZE = 256
+
+
+def analyze_transactions(transactions, window_days=30):
+    """
+    The single pass over the columns that every summary below derives from.
+
+    Returns:
+      total_income, total_expense: sums over all transactions
+      window_expense: expenses in the last window_days before the latest date
+      income_days: number of distinct income dates
+      transaction_count: number of transactions
+      window_days
+    """
+    if not transactions:
+        return {
+            "transaction_count": 0,
+            "total_income": 0.0,
+            "total_expense": 0.0,
+            "window_expense": 0.0,
+            "income_days": 0,
+            "window_days": window_days
+        }
+
+    amounts, dates = transactions.amounts, transactions.dates
+    is_income = transactions.types == INCOME
+    is_expense = transactions.types == EXPENSE
+
+    # Rolling burn window ends at the latest transaction of any type
+    window_start = dates.max() - np.timedelta64(window_days, "D")
+
+    return {
+        "transaction_count": len(transactions),
+        "total_income": float(amounts[is_income].sum()),
+        "total_expense": float(amounts[is_expense].sum()),
+        "window_expense": float(amounts[is_expense & (dates >= window_start)].sum()),
+        "income_days": int(np.unique(dates[is_income]).size),
+        "window_days": window_days
+    }
 
-    for tx in transactions:
-        if tx["type"] == "income":
-            total_income += tx["amount"]
-        elif tx["type"] == "expense":
-            total_expense += tx["amount"]
 
-    current_balance = total_income - total_expense
+def cash_flow_from_analysis(analysis):
+    total_income = analysis["total_income"]
+    total_expense = analysis["total_expense"]
 
     return {
         "total_income": total_income,
         "total_expense": total_expense,
-        "current_balance": current_balance
+        "current_balance": total_income - total_expense
     }
 
 
-def estimate_burn_rate(transactions, window_days=30):
+def burn_rate_from_analysis(analysis):
     """
-    Calculates rolling burn rate over last X days
+    Rolling burn rate over the analysis window
     """
+    return round(analysis["window_expense"] / analysis["window_days"], 2)
+
+
+def apply_scenario_to_analysis(analysis, scenario="base"):
+    """
+    Same adjustment as apply_scenario_modifiers, applied to the sums.
+    Every field is linear in the amounts, so no second pass is needed.
+    """
+    income_mult, expense_mult, _ = SCENARIO_MULTIPLIERS.get(scenario, SCENARIO_MULTIPLIERS["base"])
+
+    return {
+        **analysis,
+        "total_income": analysis["total_income"] * float(income_mult),
+        "total_expense": analysis["total_expense"] * float(expense_mult),
+        "window_expense": analysis["window_expense"] * float(expense_mult)
+    }
 
-    if not transactions:
-        return 0
 
-    # Convert dates
-    parsed_transactions = []
-    for tx in transactions:
-        tx_date = datetime.strptime(tx["date"], "%Y-%m-%d")
-        parsed_transactions.append({**tx, "parsed_date": tx_date})
+def _projection_inputs(analysis):
+    """
+    Returns (current_balance, daily_burn, avg income per income-day, income frequency)
+    """
+    income_days = analysis["income_days"]
 
-    # Find latest date
-    latest_date = max(tx["parsed_date"] for tx in parsed_transactions)
+    # Mean of per-day income totals == total income / income days
+    avg_income_per_income_day = analysis["total_income"] / income_days if income_days else 0.0
 
-    # Define window start
-    window_start = latest_date - timedelta(days=window_days)
+    return (
+        cash_flow_from_analysis(analysis)["current_balance"],
+        burn_rate_from_analysis(analysis),
+        avg_income_per_income_day,
+        income_days / analysis["window_days"]
+    )
 
-    expense_total = 0
 
-    for tx in parsed_transactions:
-        if tx["type"] == "expense" and tx["parsed_date"] >= window_start:
-            expense_total += tx["amount"]
+def _analysis_for(transactions, window_days, analysis):
+    """
+    Returns analysis, analyzing transactions only when it is None
+    """
+    if analysis is None:
+        return analyze_transactions(transactions, window_days)
 
-    daily_burn = expense_total / window_days
+    if analysis["window_days"] != window_days:
+        raise ValueError(
+            f"analysis covers window_days={analysis['window_days']}, got window_days={window_days}"
+        )
 
-    return round(daily_burn, 2)
+    return analysis
+
+
+def calculate_cash_flow(transactions):
+    return cash_flow_from_analysis(analyze_transactions(transactions))
+
+
+def estimate_burn_rate(transactions, window_days=30):
+    """
+    Calculates rolling burn rate over last X days
+    """
+    return burn_rate_from_analysis(analyze_transactions(transactions, window_days))
 
 
 def estimate_runway(current_balance, daily_burn):
@@ -72,54 +167,93 @@ def risk_level(runway_days):
         return "Low Risk 🟢"
 
 
-def project_cash_flow(transactions, projection_days=60):
+def _daily_step(daily_income, daily_burn, income_volatility, burn_volatility, rng):
     """
-    Simulates future cash balance over projection period
+    Returns step(balance) -> balance one simulated day later, drawing the
+    income factor then the burn factor from rng. Shared by every Python walk
+    so they all consume the RNG the same way.
     """
+    # Hoisted into the closure: step runs simulations * projection_days times
+    uniform = rng.uniform
+    lo_i, hi_i = 1 - income_volatility, 1 + income_volatility
+    lo_b, hi_b = 1 - burn_volatility, 1 + burn_volatility
+
+    def step(balance):
+        return balance + daily_income * uniform(lo_i, hi_i) - daily_burn * uniform(lo_b, hi_b)
+
+    return step
+
+
+def _project_from_scalars(
+    current_balance,
+    daily_burn,
+    avg_income_per_income_day,
+    income_frequency,
+    projection_days,
+    income_volatility,
+    burn_volatility,
+    rng
+):
+    step = _daily_step(
+        avg_income_per_income_day * income_frequency,
+        daily_burn,
+        income_volatility,
+        burn_volatility,
+        rng
+    )
 
-    if not transactions:
-        return []
+    projected_balance = current_balance
+    projection = []
+    cashout_day = None
 
-    # Calculate current balance
-    cash_flow = calculate_cash_flow(transactions)
-    current_balance = cash_flow["current_balance"]
+    for day in range(1, projection_days + 1):
+        projected_balance = step(projected_balance)
 
-    # Calculate rolling burn
-    daily_burn = estimate_burn_rate(transactions)
+        projection.append({"day": day, "projected_balance": round(projected_balance, 2)})
 
-    # Calculate average daily income (30-day window)
-    income_dates = {}
-    for tx in transactions:
-        if tx["type"] == "income":
-            income_dates.setdefault(tx["date"], 0)
-            income_dates[tx["date"]] += tx["amount"]
+        if cashout_day is None and projected_balance <= 0:
+            cashout_day = day
+
+    return projection, cashout_day
 
-    if income_dates:
-        avg_income_per_income_day = sum(income_dates.values()) / len(income_dates)
-        income_frequency = len(income_dates) / 30
-    else:
-        avg_income_per_income_day = 0
-        income_frequency = 0
+
+def _project_core(
+    current_balance,
+    daily_income,
+    daily_burn,
+    projection_days,
+    income_volatility,
+    burn_volatility,
+    rng
+):
+    """
+    Same walk as _project_from_scalars without building the per-day list.
+
+    Returns:
+      final_balance: float
+      cashout_day: int | None
+    """
+    step = _daily_step(daily_income, daily_burn, income_volatility, burn_volatility, rng)
 
     projected_balance = current_balance
-    projection = []
+    cashout_day = None
+    days = iter(range(1, projection_days + 1))
 
-    for day in range(1, projection_days + 1):
-        # Simulate income probabilistically
-        if income_frequency > 0:
-            income_variation = avg_income_per_income_day * income_frequency
-            income_variation *= random.uniform(0.9, 1.1)  # ±10%
-            projected_balance += income_variation
+    # Until cashout, check the balance every day...
+    for day in days:
+        projected_balance = step(projected_balance)
+
+        if projected_balance <= 0:
+            cashout_day = day
+            break
 
-        burn_variation = daily_burn * random.uniform(0.95, 1.05)  # ±5%
-        projected_balance -= burn_variation
+    # ...then finish the same walk without checking: the Monte Carlo
+    # summary still needs each run's final balance
+    for day in days:
+        projected_balance = step(projected_balance)
 
-        projection.append({
-            "day": day,
-            "projected_balance": round(projected_balance, 2)
-        })
+    return projected_balance, cashout_day
 
-    return projection
 
 def project_cash_flow(
     transactions,
@@ -127,60 +261,229 @@ def project_cash_flow(
     window_days=30,
     income_volatility=0.10,  # ±10%
     burn_volatility=0.05,    # ±5%
-    seed=None
+    seed=None,
+    analysis=None
 ):
     """
+    analysis: analyze_transactions(transactions, window_days), if the caller
+              already has it; transactions is then not read, and window_days
+              must match the analysis
+
     Returns:
       projection: list of {"day": int, "projected_balance": float}
       cashout_day: int | None   (day balance first goes <= 0)
     """
-    if seed is not None:
-        random.seed(seed)
+    analysis = _analysis_for(transactions, window_days, analysis)
 
-    if not transactions:
+    if not analysis["transaction_count"]:
         return [], None
 
-    # Current balance
-    cash_flow = calculate_cash_flow(transactions)
-    projected_balance = cash_flow["current_balance"]
+    return _project_from_scalars(
+        *_projection_inputs(analysis),
+        projection_days,
+        income_volatility,
+        burn_volatility,
+        random.Random(seed)
+    )
+
+
+def _simulate_batch(
+    current_balance,
+    daily_income,
+    daily_burn,
+    income_volatility,
+    burn_volatility,
+    simulations,
+    projection_days,
+    seed,
+    first_run=0
+):
+    """
+    Simulates all runs at once as a (simulations, projection_days) grid.
 
-    # Rolling burn
-    daily_burn = estimate_burn_rate(transactions, window_days=window_days)
+    Runs are drawn in SIMULATION_BLOCK_SIZE blocks, block k from child k of
+    SeedSequence(seed), so run i gets the same draws whichever batch it is
+    in. first_run is the index of this batch's first run and must be a
+    multiple of SIMULATION_BLOCK_SIZE.
 
-    # Income pattern: average per income-day and frequency
-    income_dates = {}
-    for tx in transactions:
-        if tx["type"] == "income":
-            income_dates.setdefault(tx["date"], 0.0)
-            income_dates[tx["date"]] += float(tx["amount"])
+    Returns:
+      endings: ending balance per run
+      cashout_days: day balance first goes <= 0 per run (0 = never)
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    shape = (simulations, projection_days)
+
+    # The grid is float32 to halve its memory traffic. It only holds the
+    # change from current_balance, which is added back in float64 at the
+    # end, so rounding error scales with the daily flows, not the balance:
+    # the cumsum's error is bounded by roughly ulp(change) * projection_days,
+    # e.g. ~$0.50 for a $100k change over 60 days (a few cents in practice).
+    # Generator.uniform has no dtype, so float32 [0, 1) draws are scaled.
+    income = np.empty(shape, dtype=np.float32)
+    burn = np.empty(shape, dtype=np.float32)
+
+    for start in range(0, simulations, SIMULATION_BLOCK_SIZE):
+        block = slice(start, start + SIMULATION_BLOCK_SIZE)
+        spawn_key = ((first_run + start) // SIMULATION_BLOCK_SIZE,)
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=spawn_key))
+
+        rng.random(dtype=np.float32, out=income[block])
+        rng.random(dtype=np.float32, out=burn[block])
+
+    income *= np.float32(2 * income_volatility * daily_income)
+    income += np.float32((1 - income_volatility) * daily_income)
+
+    burn *= np.float32(2 * burn_volatility * daily_burn)
+    burn += np.float32((1 - burn_volatility) * daily_burn)
+
+    # Daily net flow, written into income's buffer to avoid another grid
+    net = np.subtract(income, burn, out=income)
+    change = np.cumsum(net, axis=1)
+
+    cashed_out = change <= np.float32(-current_balance)
+    cashout_days = np.where(cashed_out.any(axis=1), cashed_out.argmax(axis=1) + 1, 0)
+
+    return current_balance + change[:, -1].astype(np.float64), cashout_days
+
+
+def _simulate_python(
+    current_balance,
+    daily_income,
+    daily_burn,
+    income_volatility,
+    burn_volatility,
+    simulations,
+    projection_days,
+    seed
+):
+    """
+    Same contract as _simulate_batch, one _project_core call per run.
+    Each run gets its own random.Random(seed + i), so nothing touches the
+    global random state.
+    """
+    endings = np.empty(simulations)
+    cashout_days = np.zeros(simulations, dtype=np.int64)
 
-    if income_dates:
-        avg_income_per_income_day = sum(income_dates.values()) / len(income_dates)
-        income_frequency = len(income_dates) / window_days
-    else:
-        avg_income_per_income_day = 0.0
-        income_frequency = 0.0
+    for i in range(simulations):
+        # Different seed per run for reproducibility
+        rng = random.Random(None if seed is None else seed + i)
+
+        endings[i], cashout_day = _project_core(
+            current_balance,
+            daily_income,
+            daily_burn,
+            projection_days,
+            income_volatility,
+            burn_volatility,
+            rng
+        )
 
-    projection = []
-    cashout_day = None
+        if cashout_day is not None:
+            cashout_days[i] = cashout_day
 
-    for day in range(1, projection_days + 1):
-        # Income contribution (expected daily income) with volatility
-        if income_frequency > 0:
-            income_expected = avg_income_per_income_day * income_frequency
-            income_expected *= random.uniform(1 - income_volatility, 1 + income_volatility)
-            projected_balance += income_expected
+    return endings, cashout_days
 
-        # Burn with volatility
-        burn = daily_burn * random.uniform(1 - burn_volatility, 1 + burn_volatility)
-        projected_balance -= burn
 
-        projection.append({"day": day, "projected_balance": round(projected_balance, 2)})
+def _simulate_pathwise(
+    current_balance,
+    daily_income,
+    daily_burn,
+    income_volatility,
+    burn_volatility,
+    simulations,
+    projection_days,
+    seed
+):
+    """
+    Same contract as _simulate_batch, but steps each run day by day so
+    path-dependent rules can be added. Compiled with numba when available.
+    """
+    endings = np.empty(simulations)
+    cashout_days = np.zeros(simulations, dtype=np.int64)
 
-        if cashout_day is None and projected_balance <= 0:
-            cashout_day = day
+    for i in prange(simulations):
+        np.random.seed(seed + i)
+        balance = current_balance
+
+        for day in range(1, projection_days + 1):
+            balance += daily_income * np.random.uniform(1 - income_volatility, 1 + income_volatility)
+            balance -= daily_burn * np.random.uniform(1 - burn_volatility, 1 + burn_volatility)
+
+            if cashout_days[i] == 0 and balance <= 0:
+                cashout_days[i] = day
+
+        endings[i] = balance
+
+    return endings, cashout_days
+
+
+if njit is not None:
+    _simulate_pathwise = njit(parallel=True, fastmath=True, cache=True)(_simulate_pathwise)
 
-    return projection, cashout_day
+
+def _simulate(
+    backend,
+    current_balance,
+    daily_income,
+    daily_burn,
+    income_volatility,
+    burn_volatility,
+    simulations,
+    projection_days,
+    seed,
+    first_run=0
+):
+    """
+    Runs simulations [first_run, first_run + simulations) on backend
+    """
+    args = (
+        current_balance,
+        daily_income,
+        daily_burn,
+        income_volatility,
+        burn_volatility,
+        simulations,
+        projection_days,
+    )
+
+    if backend == "numpy":
+        return _simulate_batch(*args, seed, first_run)
+
+    # The per-run backends seed run i with seed + i
+    if seed is not None:
+        seed += first_run
+
+    if backend == "python":
+        return _simulate_python(*args, seed)
+
+    # The compiled kernels need a non-negative integer seed
+    if seed is None:
+        seed = int(np.random.default_rng().integers(2**31))
+    elif seed < 0:
+        raise ValueError(f"backend='{backend}' requires a non-negative seed, got {seed}")
+
+    if backend == "numba":
+        if njit is None:
+            raise ValueError("backend='numba' requires numba to be installed")
+
+        return _simulate_pathwise(*args, seed)
+
+    if backend == "cython":
+        if simulate_many is None:
+            raise ValueError("backend='cython' requires building app/engine_fast.pyx, see build_ext.py")
+
+        return simulate_many(*args, seed)
+
+    raise ValueError(f"Unknown simulation backend: {backend}")
+
+
+def _run_chunk(args):
+    """
+    Runs simulations [start, start + count) in a worker process
+    """
+    start, count, kwargs = args
+
+    return _simulate(simulations=count, first_run=start, **kwargs)
 
 
 def run_monte_carlo_simulation(
@@ -190,44 +493,76 @@ def run_monte_carlo_simulation(
     window_days=30,
     income_volatility=0.10,
     burn_volatility=0.05,
-    seed=42
+    seed=42,
+    backend="numpy",
+    parallel=False,
+    analysis=None
 ):
     """
     Runs many simulated futures and returns risk summary.
+
+    analysis: analyze_transactions(transactions, window_days), if the caller
+              already has it (optionally via apply_scenario_to_analysis);
+              transactions is then not read, and window_days must match
+              the analysis
+
+    backend: "numpy" (batched, default), "python" (per-run reference loop),
+             "numba" (compiled per-run loop, needs numba) or
+             "cython" (compiled per-run loop, needs build_ext.py)
+    parallel: shard runs across CPU cores (ignored for small simulation counts);
+              results are the same as a serial run with the same seed
     """
-    endings = []
-    cashouts = []  # list of cashout_day for failed runs
+    # Inputs don't change between runs, so compute them once
+    analysis = _analysis_for(transactions, window_days, analysis)
 
-    for i in range(simulations):
-        # Different seed per run for reproducibility
-        sim_seed = None if seed is None else (seed + i)
-
-        projection, cashout_day = project_cash_flow(
-            transactions,
-            projection_days=projection_days,
-            window_days=window_days,
-            income_volatility=income_volatility,
-            burn_volatility=burn_volatility,
-            seed=sim_seed
+    if analysis["transaction_count"] and projection_days > 0:
+        current_balance, daily_burn, avg_income_per_income_day, income_frequency = (
+            _projection_inputs(analysis)
         )
 
-        ending_balance = projection[-1]["projected_balance"] if projection else 0.0
-        endings.append(float(ending_balance))
-
-        if cashout_day is not None:
-            cashouts.append(cashout_day)
+        sim_kwargs = {
+            "backend": backend,
+            "current_balance": current_balance,
+            "daily_income": avg_income_per_income_day * income_frequency,
+            "daily_burn": daily_burn,
+            "income_volatility": income_volatility,
+            "burn_volatility": burn_volatility,
+            "projection_days": projection_days,
+            "seed": seed,
+        }
+
+        if parallel and simulations >= PARALLEL_MIN_SIMULATIONS:
+            # Whole blocks per chunk, so the numpy draws match the serial run
+            chunk_size = -(-simulations // (os.cpu_count() or 1))
+            chunk_size = -(-chunk_size // SIMULATION_BLOCK_SIZE) * SIMULATION_BLOCK_SIZE
+            chunks = [
+                (start, min(chunk_size, simulations - start), sim_kwargs)
+                for start in range(0, simulations, chunk_size)
+            ]
+
+            # spawn, not fork: forking a threaded server (or numba's thread pool) can deadlock
+            with multiprocessing.get_context("spawn").Pool(len(chunks)) as pool:
+                results = pool.map(_run_chunk, chunks)
+
+            ending_balances = np.concatenate([endings for endings, _ in results])
+            cashout_days = np.concatenate([days for _, days in results])
+        else:
+            ending_balances, cashout_days = _simulate(simulations=simulations, **sim_kwargs)
+    else:
+        ending_balances = np.zeros(simulations)
+        cashout_days = np.zeros(simulations, dtype=np.int64)
 
-    endings_sorted = sorted(endings)
-    n = len(endings_sorted)
+    n = ending_balances.size
+    cashouts = cashout_days[cashout_days > 0]  # cashout_day for failed runs
 
-    def percentile(p):
-        if n == 0:
-            return 0.0
-        # nearest-rank style
-        idx = max(0, min(n - 1, int(round((p / 100) * (n - 1)))))
-        return endings_sorted[idx]
+    if n:
+        # nearest-rank style, selected without a full sort
+        p10, p50, p90 = np.quantile(ending_balances, [0.10, 0.50, 0.90], method="nearest")
+        worst, best = ending_balances.min(), ending_balances.max()
+    else:
+        p10 = p50 = p90 = worst = best = 0.0
 
-    prob_cashout = (len(cashouts) / simulations) if simulations > 0 else 0.0
+    prob_cashout = (cashouts.size / simulations) if simulations > 0 else 0.0
 
     result = {
         "simulations": simulations,
@@ -236,15 +571,15 @@ def run_monte_carlo_simulation(
         "income_volatility": income_volatility,
         "burn_volatility": burn_volatility,
         "probability_cashout": round(prob_cashout, 4),  # e.g. 0.2350
-        "cashout_count": len(cashouts),
-        "ending_balance_worst": round(endings_sorted[0], 2) if n else 0.0,
-        "ending_balance_median": round(percentile(50), 2),
-        "ending_balance_best": round(endings_sorted[-1], 2) if n else 0.0,
-        "ending_balance_p10": round(percentile(10), 2),
-        "ending_balance_p90": round(percentile(90), 2),
-        "avg_cashout_day": round(sum(cashouts) / len(cashouts), 2) if cashouts else None,
-        "min_cashout_day": min(cashouts) if cashouts else None,
-        "max_cashout_day": max(cashouts) if cashouts else None,
+        "cashout_count": int(cashouts.size),
+        "ending_balance_worst": round(float(worst), 2),
+        "ending_balance_median": round(float(p50), 2),
+        "ending_balance_best": round(float(best), 2),
+        "ending_balance_p10": round(float(p10), 2),
+        "ending_balance_p90": round(float(p90), 2),
+        "avg_cashout_day": round(float(cashouts.mean()), 2) if cashouts.size else None,
+        "min_cashout_day": int(cashouts.min()) if cashouts.size else None,
+        "max_cashout_day": int(cashouts.max()) if cashouts.size else None,
     }
 
     return result
@@ -254,26 +589,7 @@ def apply_scenario_modifiers(transactions, scenario="base"):
     Adjusts income and expense values based on scenario
     """
 
-    adjusted = []
-
-    for tx in transactions:
-        new_tx = tx.copy()
-
-        if scenario == "optimistic":
-            if tx["type"] == "income":
-                new_tx["amount"] *= 1.15  # +15% income
-            if tx["type"] == "expense":
-                new_tx["amount"] *= 0.95  # -5% expenses
-
-        elif scenario == "conservative":
-            if tx["type"] == "income":
-                new_tx["amount"] *= 0.85  # -15% income
-            if tx["type"] == "expense":
-                new_tx["amount"] *= 1.10  # +10% expenses
-
-        # base = no change
-
-        adjusted.append(new_tx)
-
-    return adjusted
+    # Unknown scenarios fall back to base = no change
+    multipliers = SCENARIO_MULTIPLIERS.get(scenario, SCENARIO_MULTIPLIERS["base"])
 
+    return replace(transactions, amounts=transactions.amounts * multipliers[transactions.types])
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Literal
+import hmac
 import os
 from fastapi import Header, HTTPException, Depends
 from dotenv import load_dotenv
@@ -11,23 +12,28 @@ def verify_api_key(x_api_key: str = Header(None)):
     if x_api_key is None:
         raise HTTPException(status_code=401, detail="API key missing")
 
-    if x_api_key != API_KEY:
+    # Constant-time compare; an unset API_KEY rejects every request
+    if not API_KEY_BYTES or not hmac.compare_digest(x_api_key.encode(), API_KEY_BYTES):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
+API_KEY_BYTES = API_KEY.encode() if API_KEY else b""
 
 
 from app.engine import (
-    calculate_cash_flow,
-    estimate_burn_rate,
+    analyze_transactions,
+    apply_scenario_to_analysis,
+    burn_rate_from_analysis,
+    cash_flow_from_analysis,
     estimate_runway,
     risk_level,
     project_cash_flow,
     run_monte_carlo_simulation
 )
+from app.models import Transactions
 
 app = FastAPI(title="AI Ops Brain API")
 app.add_middleware(
@@ -45,60 +51,48 @@ class Transaction(BaseModel):
     type: str
 
 
-class TransactionRequest(BaseModel):
+MAX_PROJECTION_DAYS = 365
+
+
+class AnalyzeRequest(BaseModel):
     transactions: List[Transaction]
+    scenario: Literal["base", "optimistic", "conservative"] = "base"
+    # Bounded: sizes the per-day projection and the Monte Carlo grids
+    projection_days: int = Field(60, ge=1, le=MAX_PROJECTION_DAYS)
 
 
 @app.post("/analyze")
-def analyze(data: TransactionRequest, _: str = Depends(verify_api_key)):
-    transactions = [t.dict() for t in data.transactions]
+def analyze(data: AnalyzeRequest, _: str = Depends(verify_api_key)):
+    # Built and analyzed once, shared by every result below
+    transactions = Transactions.from_pydantic(data.transactions)
+    analysis = analyze_transactions(transactions)
 
-    cash_flow = calculate_cash_flow(transactions)
-    daily_burn = estimate_burn_rate(transactions)
+    cash_flow = cash_flow_from_analysis(analysis)
+    daily_burn = burn_rate_from_analysis(analysis)
     runway = estimate_runway(cash_flow["current_balance"], daily_burn)
     risk = risk_level(runway)
 
-    return {
-        "cash_flow": cash_flow,
-        "daily_burn": daily_burn,
-        "runway_days": runway,
-        "risk_level": risk
-    }
-
-
-@app.post("/analyze")
-def analyze(data: TransactionRequest, _: str = Depends(verify_api_key)):
-    transactions = [t.dict() for t in data.transactions]
-
-    projection, cashout_day = project_cash_flow(transactions, projection_days=60)
-
-    return {
-        "projection": projection,
-        "cashout_day": cashout_day
-    }
-
-
-from app.engine import apply_scenario_modifiers
-
-class RiskRequest(BaseModel):
-    transactions: List[Transaction]
-    scenario: str = "base"
-
-
-@app.post("/analyze")
-def analyze(data: TransactionRequest, _: str = Depends(verify_api_key)):
-    transactions = [t.dict() for t in data.transactions]
-
-    adjusted = apply_scenario_modifiers(transactions, data.scenario)
+    projection, cashout_day = project_cash_flow(
+        transactions,
+        projection_days=data.projection_days,
+        analysis=analysis
+    )
 
     result = run_monte_carlo_simulation(
-        adjusted,
+        transactions,
         simulations=200,
-        projection_days=60
+        projection_days=data.projection_days,
+        analysis=apply_scenario_to_analysis(analysis, data.scenario)
     )
 
     return {
+        "cash_flow": cash_flow,
+        "daily_burn": daily_burn,
+        # No burn gives an infinite runway, which JSON can't carry
+        "runway_days": None if runway == float("inf") else runway,
+        "risk_level": risk,
+        "projection": projection,
+        "cashout_day": cashout_day,
         "scenario": data.scenario,
         "result": result
     }
-
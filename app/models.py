@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+INCOME = 0
+EXPENSE = 1
+OTHER = 2  # any other type: kept for dates, excluded from every sum
+
+
+@dataclass(frozen=True)
+class Transactions:
+    """
+    Transactions stored column-wise:
+      amounts: float64
+      dates: datetime64[D]
+      types: int8, INCOME, EXPENSE or OTHER
+    """
+
+    amounts: np.ndarray
+    dates: np.ndarray
+    types: np.ndarray
+
+    def __len__(self):
+        return self.amounts.size
+
+    @classmethod
+    def from_columns(cls, dates, amounts, types):
+        """
+        Builds from date, amount and lowercase type columns
+        """
+        types = np.asarray(types, dtype=str)
+
+        codes = np.full(types.size, OTHER, dtype=np.int8)
+        codes[types == "income"] = INCOME
+        codes[types == "expense"] = EXPENSE
+
+        return cls(
+            amounts=np.asarray(amounts, dtype=np.float64),
+            dates=np.asarray(dates, dtype="datetime64[D]"),
+            types=codes,
+        )
+
+    @classmethod
+    def from_pydantic(cls, models):
+        """
+        Builds straight from request Transaction models, no dicts in between
+        """
+        return cls.from_columns(
+            [m.date for m in models],
+            np.fromiter((m.amount for m in models), dtype=np.float64, count=len(models)),
+            [m.type for m in models],
+        )
@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 
+from app.models import Transactions
+
 
 def parse_csv(file_path):
     """
@@ -7,16 +10,16 @@ def parse_csv(file_path):
     date, amount, type
     """
 
-    df = pd.read_csv(file_path)
-
-    transactions = []
-
-    for _, row in df.iterrows():
-        transactions.append({
-            "date": row["date"],
-            "amount": float(row["amount"]),
-            "type": row["type"].lower()
-        })
-
-    return transactions
+    # Let the C reader type the columns instead of converting afterwards
+    df = pd.read_csv(
+        file_path,
+        usecols=["date", "amount", "type"],
+        dtype={"amount": np.float64, "type": str},
+        parse_dates=["date"],
+    )
 
+    return Transactions.from_columns(
+        df["date"].to_numpy(dtype="datetime64[D]"),
+        df["amount"].to_numpy(),
+        df["type"].str.lower().to_numpy(),
+    )
@@ -0,0 +1,21 @@
+"""
+Builds the optional compiled Monte Carlo kernel used by
+run_monte_carlo_simulation(backend="cython"). This is not a package
+setup script; Cython is only needed when building the kernel:
+
+    pip install cython
+    python build_ext.py build_ext --inplace
+"""
+from Cython.Build import cythonize
+from setuptools import Extension, setup
+
+setup(
+    packages=[],
+    ext_modules=cythonize([
+        Extension(
+            "app.engine_fast",
+            ["app/engine_fast.pyx"],
+            extra_compile_args=["-O3", "-march=native"],
+        )
+    ]),
+)
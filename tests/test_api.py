@@ -0,0 +1,32 @@
+import os
+import unittest
+
+os.environ["API_KEY"] = "test-key"
+
+from fastapi.testclient import TestClient
+
+from app import main
+
+client = TestClient(main.app)
+
+
+class AnalyzeTest(unittest.TestCase):
+    def post(self, body):
+        return client.post("/analyze", json=body, headers={"x-api-key": "test-key"})
+
+    def test_income_only(self):
+        response = self.post({"transactions": [{"date": "2026-02-01", "amount": 5000, "type": "income"}]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["runway_days"])
+        self.assertEqual(response.json()["risk_level"], "No Risk")
+
+    def test_empty(self):
+        response = self.post({"transactions": []})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["runway_days"])
+
+
+if __name__ == "__main__":
+    unittest.main()